@@ -1,47 +1,160 @@
+# pip install openbb yfinance pandas requests diskcache lxml pyarrow
 import datetime
+import json
+import os
+import tempfile
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import diskcache
+import lxml.html
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
 import yfinance as yf
 from openbb import obb
 
 
 ''' this code will attempt to collect the financial information of the largest compnay in the sp500 and do some basic math with it, to be expanded later over a larger range'''
 
+CACHE = diskcache.Cache("./.dao_cache")  # shared on-disk cache, entries expire per call site
+STATEMENT_DIR = Path("./cache")          # latest statement rows as Parquet, one file per ticker/statement
+STATEMENT_TTL = 7 * 86400
 
+
+@CACHE.memoize(expire=86400)  # index membership changes rarely
 def get_sp500_tickers() -> list[str]:
     """Scrape the live list of S&P 500 tickers from Wikipedia."""
     url = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
-    tables = pd.read_html(url)
-    df = tables[0]
-    return df.Symbol.str.replace(".", "-", regex=False).tolist()
-
-def get_market_cap(ticker: str) -> float:
-    """Fetch current market cap from Yahoo Finance (yfinance)."""
-    info = yf.Ticker(ticker).info
-    return info.get("marketCap", 0)
+    resp = requests.get(url, headers={"User-Agent": "Mozilla/5.0"}, timeout=10)
+    resp.raise_for_status()
+    # only the symbol column of the constituents table, no DataFrame round-trip
+    doc = lxml.html.fromstring(resp.content)
+    syms = doc.xpath('//table[@id="constituents"]//tr/td[1]/a/text()')
+    return [s.replace(".", "-") for s in syms]
+
+QUOTE_URL = "https://query2.finance.yahoo.com/v7/finance/quote"
+QUOTE_BATCH = 20  # max symbols Yahoo accepts per quote call
+_STATEMENT_POOL = ThreadPoolExecutor(max_workers=3)  # income / balance / cash
+
+def _yahoo_session() -> tuple[requests.Session, str]:
+    """A Session primed with the cookie + crumb Yahoo's quote API wants."""
+    sess = requests.Session()
+    sess.headers["User-Agent"] = "Mozilla/5.0"
+    sess.get("https://fc.yahoo.com", timeout=10)  # only sets the cookie, a 404 is normal
+    resp = sess.get("https://query2.finance.yahoo.com/v1/test/getcrumb", timeout=10)
+    resp.raise_for_status()  # a 429 body must never become the crumb
+    return sess, resp.text
+
+def _quote_chunk(sess: requests.Session, crumb: str, chunk: list[str]) -> dict[str, float] | None:
+    """One quote call for up to 20 symbols -> {symbol: marketCap}; None if the call failed."""
+    try:
+        resp = sess.get(QUOTE_URL, params={"symbols": ",".join(chunk), "crumb": crumb}, timeout=10)
+        resp.raise_for_status()
+        result = resp.json()["quoteResponse"]["result"]
+    except (requests.RequestException, KeyError, json.JSONDecodeError) as e:
+        warnings.warn(f"{','.join(chunk)}: {e}")
+        return None
+    return {q["symbol"]: q["marketCap"] for q in result if "marketCap" in q}
+
+def _fast_market_cap(ticker: str) -> float | None:
+    """Single-symbol fallback via yfinance `fast_info`, `.info` only as a last resort."""
+    t = yf.Ticker(ticker)
+    try:
+        try:
+            return t.fast_info["market_cap"]
+        except (KeyError, ValueError):
+            return t.info.get("marketCap")
+    except Exception as e:  # yfinance raises a grab-bag of types for dead symbols
+        warnings.warn(f"{ticker}: {e}")
+        return None
+
+def get_market_caps(tickers: list[str]) -> dict[str, float]:
+    """Fetch current market caps, 20 symbols per quote request, chunks in parallel."""
+    key = ("get_market_caps", tuple(tickers))
+    caps = CACHE.get(key)
+    if caps is not None:
+        return caps
+
+    chunks = [tickers[i:i + QUOTE_BATCH] for i in range(0, len(tickers), QUOTE_BATCH)]
+    caps = {}
+    complete = True  # every quote batch answered
+    try:
+        sess, crumb = _yahoo_session()
+    except requests.RequestException as e:
+        warnings.warn(f"Yahoo quote session unavailable, using fast_info only: {e}")
+        chunks, complete = [], False
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        # one primed Session shared by the workers: cookie + crumb fetched once per call
+        for part in ex.map(lambda chunk: _quote_chunk(sess, crumb, chunk), chunks):
+            if part is None:
+                complete = False
+            else:
+                caps.update(part)
+        # symbols the quote batch came back without: one light fast_info call each
+        missing = [t for t in tickers if t not in caps]
+        for t, cap in zip(missing, ex.map(_fast_market_cap, missing)):
+            if cap:
+                caps[t] = cap
+
+    if not caps:
+        raise RuntimeError(f"no market caps returned for any of {len(tickers)} tickers")
+    # memoise only a full answer, so a failed or partial fetch isn't replayed
+    if complete:
+        CACHE.set(key, caps, expire=900)  # prices move intraday
+    return caps
 
 def find_index_label(series: pd.Series, keywords: list[str]) -> str:
     """Find the first index label containing all keywords (case-insensitive)."""
-    for label in series.index:
-        low = label.lower()
-        if all(k in low for k in keywords):
-            return label
+    low  = series.index.str.lower()
+    mask = low.str.contains(keywords[0], regex=False)
+    for k in keywords[1:]:
+        mask &= low.str.contains(k, regex=False)
+    if mask.any():
+        return series.index[mask.argmax()]
     # Dump what you have, then error
     print(f"[DEBUG fields for {series.name}]:", series.index.tolist())
     raise KeyError(f"No field matching {keywords} in {series.name}")
 
+def _write_statement(latest: pd.DataFrame, path: Path) -> None:
+    """Write via a temp file + os.replace, so a crash never leaves a half-written cache entry."""
+    tmp = None
+    try:
+        STATEMENT_DIR.mkdir(exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=STATEMENT_DIR, suffix=".tmp")
+        os.close(fd)
+        latest.to_parquet(tmp, engine="pyarrow", compression="zstd")
+        os.replace(tmp, path)
+    except (OSError, ValueError, TypeError, pa.ArrowException) as e:
+        # the fetched statement is still good; only the cache write is lost
+        warnings.warn(f"couldn't cache {path}: {e}")
+        if tmp and os.path.exists(tmp):
+            os.remove(tmp)
+
+def _latest_statement(ticker: str, stmt: str, period: str) -> pd.Series:
+    """Latest row of one OpenBB statement, kept as a one-row Parquet file for a week."""
+    path = STATEMENT_DIR / f"{ticker}_{stmt}_{period}.parquet"
+    if path.exists() and time.time() - path.stat().st_mtime < STATEMENT_TTL:
+        try:
+            return pq.read_table(path).to_pandas().squeeze()
+        except (OSError, pa.ArrowException) as e:  # unreadable file: treat as a miss
+            warnings.warn(f"{path}: {e}")
+    latest = getattr(obb.equity.fundamental, stmt)(ticker, period=period).to_df().tail(1)
+    _write_statement(latest, path)
+    return latest.squeeze()
+
 def load_financials(ticker: str):
     """
     Pull the latest annual Income, Balance & Cash-Flow statements.
     Returns three pandas Series.
     """
-    inc_df = obb.equity.fundamental.income(ticker,  period="quarter").to_df()
-    bal_df = obb.equity.fundamental.balance(ticker, period="quarter").to_df()
-    cfs_df = obb.equity.fundamental.cash(ticker,    period="quarter").to_df()
-
-
-    latest_inc = inc_df.tail(1).squeeze()
-    latest_bal = bal_df.tail(1).squeeze()
-    latest_cfs = cfs_df.tail(1).squeeze()
+    # the three statements are independent requests, so fetch them side by side
+    futures = [_STATEMENT_POOL.submit(_latest_statement, ticker, stmt, "quarter")
+               for stmt in ("income", "balance", "cash")]
+    latest_inc, latest_bal, latest_cfs = (f.result() for f in futures)
     return latest_inc, latest_bal, latest_cfs
 
 def compute_roic(inc: pd.Series, bal: pd.Series, tax_rate: float = 0.21) -> float:
@@ -67,8 +180,8 @@ if __name__ == "__main__":
     # 1) Get all S&P 500 tickers
     tickers = get_sp500_tickers()
 
-    # 2) Fetch each ticker’s cap, pick the max
-    caps = {t: get_market_cap(t) for t in tickers}
+    # 2) Fetch every ticker’s cap in batched quote calls, pick the max
+    caps = get_market_caps(tickers)
     largest = max(caps, key=caps.get)
     print("Largest S&P 500 company by market-cap:", largest)
     print("Market-cap:", caps[largest])
@@ -8,7 +8,7 @@
 # 4. Re‑balances your personal portfolio once a month
 #
 # How to use:
-#   $ pip install openbb sec-api yfinance pandas numpy schedule sqlalchemy
+#   $ pip install openbb sec-api yfinance pandas numpy schedule sqlalchemy diskcache aiohttp
 #   $ python siegfried_portfolio.py  # dry‑run prints target trades
 #
 # Next steps:
@@ -20,15 +20,20 @@
 
 from __future__ import annotations
 
+import asyncio
 import os
 import sys
 import time
 import json
+import threading
 import schedule
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, date
-from functools import lru_cache
-from typing import List, Dict, Any
+from functools import wraps
+from typing import Callable, List, Dict, Any
 
+import aiohttp
+import diskcache
 import pandas as pd
 import numpy as np
 import yfinance as yf
@@ -46,46 +51,192 @@ CFG = {
     "POSITION_MAX_PCT": 0.15,      # max 15 % of portfolio per position
     "PORTFOLIO_EQUITY": 100_000,   # starting capital (USD)
     "UNIVERSE_FILE": "sp500_tickers.csv",  # universe list
+    "CACHE_DIR": ".dao_cache",     # on-disk cache for fundamentals & caps
+    "FUNDAMENTALS_MAX_AGE": 7 * 86400,     # served as fresh for a week …
+    "FUNDAMENTALS_STALE_TTL": 30 * 86400,  # … then stale + background refresh for a month
+    "FETCH_WORKERS": 8,            # concurrent tickers during a screen
+    "HTTP_TIMEOUT": 15,            # seconds, where the HTTP client lets us set one
+    "SCREEN_TIMEOUT": 15 * 60,     # seconds for all screen fetches; stragglers count as failed
+    "ASYNC_CONCURRENCY": 64,       # in‑flight quote requests during a screen
 }
 
 # ---------------------------------------------------------------------------
 # 1  –  Data layer
 # ---------------------------------------------------------------------------
 
-@lru_cache(maxsize=None)
+CACHE = diskcache.Cache(CFG["CACHE_DIR"])
+_REFRESH_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="refresh")
+
+
+class StaleLRU:
+    """Stale‑while‑revalidate decorator backed by the disk cache.
+
+    Entries younger than `max_age` are returned as is. Older ones (up to
+    `max_age + stale_while_revalidate`) are still returned immediately, while
+    a refresh is queued on the background pool. Only a true miss blocks.
+    `fn.refresh(*args)` re‑fetches synchronously, ignoring the cached copy.
+    """
+
+    def __init__(self, max_age: float, stale_while_revalidate: float):
+        self.max_age = max_age
+        self.expire = max_age + stale_while_revalidate
+        self._inflight: set = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, fn: Callable) -> Callable:
+        def fetch(key, args):
+            value = fn(*args)
+            CACHE.set(key, (value, time.time()), expire=self.expire)
+            return value
+
+        def refresh(key, args):
+            try:
+                fetch(key, args)
+            except Exception as exc:
+                print(f"Background refresh of {key} failed: {exc}", file=sys.stderr)
+            finally:
+                with self._lock:
+                    self._inflight.discard(key)
+
+        @wraps(fn)
+        def wrapper(*args):
+            key = (fn.__qualname__,) + args
+            hit = CACHE.get(key)
+            if hit is None:
+                return fetch(key, args)
+            value, fetched_at = hit
+            if time.time() - fetched_at >= self.max_age:
+                with self._lock:
+                    if key not in self._inflight:
+                        self._inflight.add(key)
+                        _REFRESH_POOL.submit(refresh, key, args)
+            return value
+
+        wrapper.refresh = lambda *args: fetch((fn.__qualname__,) + args, args)
+        return wrapper
+
+
+_fundamentals_cache = StaleLRU(CFG["FUNDAMENTALS_MAX_AGE"], CFG["FUNDAMENTALS_STALE_TTL"])
+
+@_fundamentals_cache
 def _load_openbb_income(tkr: str) -> pd.Series:
     return obb.equity.fundamental.income(tkr, period="A").latest()
 
-@lru_cache(maxsize=None)
+@_fundamentals_cache
 def _load_openbb_balance(tkr: str) -> pd.Series:
     return obb.equity.fundamental.balance(tkr, period="A").latest()
 
-@lru_cache(maxsize=None)
+@_fundamentals_cache
 def _load_openbb_cash(tkr: str) -> pd.Series:
     return obb.equity.fundamental.cash(tkr, period="A").latest()
 
 
 def get_market_cap(tkr: str) -> float:
-    """YFinance single call – slower but reliable for US tickers."""
+    """YFinance `fast_info` (one chart call); full `.info` only if that lacks the cap."""
+    key = ("get_market_cap", tkr)
+    cap = CACHE.get(key)
+    if cap is not None:
+        return cap
+    ticker = yf.Ticker(tkr)
     try:
-        return yf.Ticker(tkr).info.get("marketCap", np.nan)
+        try:
+            cap = ticker.fast_info["market_cap"]
+        except (KeyError, ValueError):
+            cap = ticker.info.get("marketCap")
     except Exception:
         return np.nan
+    if cap is None or np.isnan(cap):
+        return np.nan
+    CACHE.set(key, cap, expire=900)  # prices move intraday; failures are never cached
+    return cap
+
+
+QUOTE_URL = "https://query2.finance.yahoo.com/v7/finance/quote"
+QUOTE_BATCH = 20  # max symbols Yahoo accepts per quote call
+
+
+async def _quote_market_caps(tickers: List[str]) -> Dict[str, float]:
+    sem = asyncio.Semaphore(CFG["ASYNC_CONCURRENCY"])
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=CFG["ASYNC_CONCURRENCY"]),
+        timeout=aiohttp.ClientTimeout(total=CFG["HTTP_TIMEOUT"]),
+        headers={"User-Agent": "Mozilla/5.0"},
+    ) as sess:
+        # the quote API wants a cookie (set by fc.yahoo.com, 404 is normal) + crumb
+        async with sess.get("https://fc.yahoo.com"):
+            pass
+        async with sess.get("https://query2.finance.yahoo.com/v1/test/getcrumb") as resp:
+            resp.raise_for_status()  # never take a 429 body as the crumb
+            crumb = await resp.text()
+
+        async def fetch(chunk: List[str]) -> Dict[str, float]:
+            async with sem:
+                try:
+                    params = {"symbols": ",".join(chunk), "crumb": crumb}
+                    async with sess.get(QUOTE_URL, params=params) as resp:
+                        resp.raise_for_status()
+                        result = (await resp.json())["quoteResponse"]["result"]
+                except (aiohttp.ClientError, asyncio.TimeoutError, KeyError, ValueError) as exc:
+                    print(f"Quote batch {chunk[0]}..{chunk[-1]} failed: {exc}", file=sys.stderr)
+                    return {}
+            return {q["symbol"]: q["marketCap"] for q in result if "marketCap" in q}
+
+        chunks = [tickers[i:i + QUOTE_BATCH] for i in range(0, len(tickers), QUOTE_BATCH)]
+        caps: Dict[str, float] = {}
+        for part in await asyncio.gather(*(fetch(c) for c in chunks)):
+            caps.update(part)
+        return caps
+
+
+def get_market_caps(tickers: List[str]) -> Dict[str, float]:
+    """All caps in one event loop – batched quote calls, all in flight together.
+
+    Tickers missing from the result (or everything, if Yahoo refuses the
+    session) are left to the per‑ticker `get_market_cap` fallback.
+    """
+    try:
+        return asyncio.run(_quote_market_caps(tickers))
+    except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+        print(f"Batched market caps unavailable: {exc}", file=sys.stderr)
+        return {}
 
 
 # ---------------------------------------------------------------------------
 # 2  –  Factor maths
 # ---------------------------------------------------------------------------
 
-def compute_roic(inc: pd.Series, bal: pd.Series, tax_rate: float = CFG["TAX_RATE"]) -> float:
-    nopat = inc.get("OperatingIncome", np.nan) * (1 - tax_rate)
-    invested_cap = bal.get("TotalDebt", np.nan) + bal.get("TotalEquity", np.nan) - bal.get("CashAndEquivalents", 0)
-    return float(nopat / invested_cap) if invested_cap else np.nan
+# Statement fields the screen reads, with the value used when a filing lacks one
+INCOME_FIELDS = pd.Index(["OperatingIncome"])
+INCOME_DEFAULTS = np.array([np.nan])
+BALANCE_FIELDS = pd.Index(["TotalDebt", "TotalEquity", "CashAndEquivalents", "TotalAssets", "TotalLiabilities"])
+BALANCE_DEFAULTS = np.array([np.nan, np.nan, 0.0, np.nan, np.nan])
+
+
+def _take_fields(stmt: pd.Series, fields: pd.Index, defaults: np.ndarray) -> np.ndarray:
+    """All `fields` of `stmt` in one positional read (one indexer lookup, no per‑label .get)."""
+    pos = stmt.index.get_indexer(fields)
+    hit = pos >= 0  # -1 = label missing: keep the default, never read stmt[-1]
+    out = defaults.astype(float)
+    out[hit] = pd.to_numeric(stmt.to_numpy()[pos[hit]], errors="coerce")
+    return out
 
 
-def compute_faustmann_ratio(mkt_cap: float, bal: pd.Series) -> float:
-    net_worth = bal.get("TotalAssets", np.nan) - bal.get("TotalLiabilities", np.nan)
-    return float(mkt_cap / net_worth) if net_worth else np.nan
+# Both ratios work element‑wise, so the whole universe is scored in one pass
+# over (N,) float arrays; a zero denominator yields NaN, which fails any screen.
+
+def compute_roic(op_income: np.ndarray, total_debt: np.ndarray, total_equity: np.ndarray,
+                 cash: np.ndarray, tax_rate: float = CFG["TAX_RATE"]) -> np.ndarray:
+    nopat = op_income * (1 - tax_rate)
+    invested_cap = total_debt + total_equity - cash
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(invested_cap != 0, nopat / invested_cap, np.nan)
+
+
+def compute_faustmann_ratio(mkt_cap: np.ndarray, total_assets: np.ndarray,
+                            total_liabilities: np.ndarray) -> np.ndarray:
+    net_worth = total_assets - total_liabilities
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(net_worth != 0, mkt_cap / net_worth, np.nan)
 
 
 # ---------------------------------------------------------------------------
@@ -94,27 +245,54 @@ def compute_faustmann_ratio(mkt_cap: float, bal: pd.Series) -> float:
 
 class SiegfriedScreener:
     def __init__(self, universe: List[str]):
-        self.universe = list(set(universe))
+        self.universe = sorted(set(universe))  # deduped and in canonical order
 
-    def _evaluate_ticker(self, tkr: str) -> Dict[str, Any] | None:
+    def _fetch_inputs(self, tkr: str, mkt_cap: float | None) -> np.ndarray | None:
+        """Raw screen inputs for `tkr`, in `run`'s column order; None if the fetch fails."""
         try:
-            inc, bal, cfs = _load_openbb_income(tkr), _load_openbb_balance(tkr), _load_openbb_cash(tkr)
-            roic_val = compute_roic(inc, bal)
-            if roic_val is None or np.isnan(roic_val):
-                return None
-            fr_val = compute_faustmann_ratio(get_market_cap(tkr), bal)
-            if np.isnan(fr_val):
-                return None
-            if roic_val > CFG["ROIC_THRESHOLD"] and fr_val < CFG["FR_THRESHOLD"]:
-                return {"ticker": tkr, "roic": roic_val, "faustmann": fr_val}
+            inc, bal = _load_openbb_income(tkr), _load_openbb_balance(tkr)
+            return np.concatenate([
+                _take_fields(inc, INCOME_FIELDS, INCOME_DEFAULTS),
+                _take_fields(bal, BALANCE_FIELDS, BALANCE_DEFAULTS),
+                [mkt_cap if mkt_cap is not None else get_market_cap(tkr)],
+            ])
         except Exception as exc:
             print(f"Problem with {tkr}: {exc}", file=sys.stderr)
         return None
 
     def run(self) -> pd.DataFrame:
-        rows = [self._evaluate_ticker(t) for t in self.universe]
-        df = pd.DataFrame([r for r in rows if r])
-        return df.sort_values("faustmann") if not df.empty else df
+        # caps: every quote request in flight at once on one event loop
+        caps = get_market_caps(self.universe)
+        # statements: the OpenBB SDK is blocking, so overlap those on threads
+        tickers = np.array(self.universe, dtype=object)
+        # float64: debt + equity − cash and assets − liabilities subtract ~1e11
+        # values, where float32 spacing (~8k–65k) would swamp small denominators
+        inputs = np.full((len(tickers), 7), np.nan)
+        # The OpenBB / yfinance calls take no timeout, so the deadline is enforced on
+        # the futures: a hung fetch may keep its thread, but never the rebalance.
+        ex = ThreadPoolExecutor(max_workers=CFG["FETCH_WORKERS"])
+        futures = [ex.submit(self._fetch_inputs, t, caps.get(t)) for t in self.universe]
+        done, _ = wait(futures, timeout=CFG["SCREEN_TIMEOUT"])
+        ex.shutdown(wait=False, cancel_futures=True)
+        for i, fut in enumerate(futures):
+            if fut not in done:
+                print(f"Problem with {tickers[i]}: timed out", file=sys.stderr)
+            elif fut.result() is not None:
+                inputs[i] = fut.result()
+        op_income, debt, equity, cash, assets, liabilities, mkt_cap = inputs.T
+
+        # CPU part: score and screen every ticker at once (NaN compares False)
+        roics = compute_roic(op_income, debt, equity, cash)
+        frs = compute_faustmann_ratio(mkt_cap, assets, liabilities)
+        keep = (roics > CFG["ROIC_THRESHOLD"]) & (frs < CFG["FR_THRESHOLD"])
+        # only the finished ratios are narrowed: 7 digits is plenty for reporting
+        df = pd.DataFrame({
+            "ticker": pd.Categorical(tickers[keep]),
+            "roic": roics[keep].astype(np.float32),
+            "faustmann": frs[keep].astype(np.float32),
+        })
+        # rows are already in ticker order, so a stable sort breaks FR ties by ticker
+        return df.sort_values("faustmann", kind="stable", ignore_index=True)
 
 # ---------------------------------------------------------------------------
 # 4  –  Portfolio logic (toy example)
@@ -124,6 +302,24 @@ class Portfolio:
     def __init__(self, equity: float):
         self.cash = equity
         self.positions: Dict[str, Dict[str, float]] = {}  # ticker→ {shares, cost_basis}
+        self._price_cache: dict[str, float] = {}          # ticker→ last close, cleared per rebalance
+
+    def _prefetch_prices(self, tickers: List[str]):
+        """Fill the price cache for every uncached ticker with one batched download."""
+        missing = [t for t in dict.fromkeys(tickers) if t not in self._price_cache]
+        if not missing:
+            return
+        # "Close" across all tickers at once → last row is a Series indexed by ticker
+        close = yf.download(missing, period="1d", threads=True, progress=False,
+                            timeout=CFG["HTTP_TIMEOUT"])["Close"]
+        if isinstance(close, pd.Series):  # older yfinance: flat columns for a single symbol
+            close = close.to_frame(missing[0])
+        self._price_cache.update(close.iloc[-1].to_dict())
+
+    def _get_price(self, tkr: str) -> float:
+        if tkr not in self._price_cache:
+            self._prefetch_prices([tkr])
+        return self._price_cache[tkr]
 
     def target_equal_weight(self, picks: pd.DataFrame):
         if picks.empty:
@@ -131,15 +327,17 @@ class Portfolio:
             return
         n = len(picks)
         alloc_per = min(CFG["POSITION_MAX_PCT"], 1.0 / n)
+        # one batched download for picks + current holdings instead of N history() calls
+        self._prefetch_prices(list(picks.ticker) + list(self.positions))
         target_dollars = alloc_per * (self.cash + self.market_value())
         orders = []
-        for _, row in picks.iterrows():
-            price = yf.Ticker(row.ticker).history(period="1d").iloc[-1].Close
+        for tkr in picks.ticker:
+            price = self._get_price(tkr)
             qty_target = target_dollars // price
-            held = self.positions.get(row.ticker, {}).get("shares", 0)
+            held = self.positions.get(tkr, {}).get("shares", 0)
             delta = qty_target - held
             if delta != 0:
-                orders.append({"ticker": row.ticker, "qty": int(delta), "price": price})
+                orders.append({"ticker": tkr, "qty": int(delta), "price": price})
         print("Suggested orders:")
         for o in orders:
             sign = "BUY" if o["qty"] > 0 else "SELL"
@@ -147,10 +345,10 @@ class Portfolio:
         # TODO: integrate with Broker.execute()
 
     def market_value(self) -> float:
+        self._prefetch_prices(list(self.positions))
         mv = 0.0
         for tkr, pos in self.positions.items():
-            price = yf.Ticker(tkr).history(period="1d").iloc[-1].Close
-            mv += pos["shares"] * price
+            mv += pos["shares"] * self._get_price(tkr)
         return mv
 
 
@@ -181,11 +379,34 @@ def rebalance_job():
     picks = screener.run()
     print(f"Qualified tickers this run: {len(picks)}")
     if not picks.empty:
+        port._price_cache.clear()  # fresh quotes every run, shared within it
         port.target_equal_weight(picks)
         # persist picks and portfolio snapshot to disk/db
         picks.to_csv("latest_picks.csv", index=False)
 
 
+def refresh_fundamentals_job():
+    """Re‑fetch every universe ticker's statements ahead of the next rebalance.
+
+    Run weekly: without it a 30‑day rebalance would always read month‑old
+    stale entries while their revalidation only lands for the run after.
+    """
+    CACHE.expire()  # drop entries already past their stale window
+
+    def refresh(tkr: str):
+        try:
+            _load_openbb_income.refresh(tkr)
+            _load_openbb_balance.refresh(tkr)
+        except Exception as exc:
+            print(f"Problem refreshing {tkr}: {exc}", file=sys.stderr)
+
+    ex = ThreadPoolExecutor(max_workers=CFG["FETCH_WORKERS"])
+    _, late = wait([ex.submit(refresh, t) for t in load_universe()], timeout=CFG["SCREEN_TIMEOUT"])
+    ex.shutdown(wait=False, cancel_futures=True)
+    if late:
+        print(f"Fundamentals refresh: {len(late)} tickers timed out", file=sys.stderr)
+
+
 # ---------------------------------------------------------------------------
 # 7  –  Entry point
 # ---------------------------------------------------------------------------
@@ -196,7 +417,13 @@ if __name__ == "__main__":
     # run immediately, then every 30 days
     rebalance_job()
     schedule.every(30).days.do(rebalance_job)
+    schedule.every(7).days.do(refresh_fundamentals_job)  # keep filings ≤ a week old
 
+    # sleep straight through to the next due job instead of polling
     while True:
+        n = schedule.idle_seconds()
+        if n is None:  # no jobs left
+            break
+        if n > 0:
+            time.sleep(n)
         schedule.run_pending()
-        time.sleep(60 * 30)  # wake up twice an hour
@@ -1,48 +1,228 @@
+# pip install openbb yfinance pandas requests diskcache duckdb lxml pyarrow
+# (optional: numexpr, used automatically by DataFrame.query when installed)
 import datetime
+import json
+import os
+import tempfile
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import diskcache
+import duckdb
+import lxml.html
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
 import yfinance as yf
 from openbb import obb           # OpenBB SDK for fundamentals
 
+QUOTE_URL   = "https://query2.finance.yahoo.com/v7/finance/quote"
+QUOTE_BATCH = 20                 # max symbols Yahoo accepts per quote call
+_STATEMENT_POOL = ThreadPoolExecutor(max_workers=3)   # income / balance / cash
+CACHE       = diskcache.Cache("./.dao_cache")
+STATEMENT_DIR = Path("./cache")  # latest statement rows as Parquet, one file per ticker/statement
+STATEMENT_TTL = 7 * 86400
+# Yahoo statements mirrored on Hugging Face: one long table of
+# (symbol, report_date, finance_type, period_type, item_name, item_value)
+STATEMENTS_PARQUET = "hf://datasets/bwzheng2010/yahoo-finance-data/data/stock_statement.parquet"
+# The mirror's snake_case items overlap heavily under keyword search
+# (total_assets / total_non_current_assets, "cash" …), so pull exactly the
+# rows the screen needs and relabel them to the names compute_* resolve.
+MIRROR_ITEMS = {
+    "operating_income":                        "OperatingIncome",
+    "total_debt":                              "TotalDebt",
+    "stockholders_equity":                     "TotalEquity",
+    "cash_and_cash_equivalents":               "CashAndEquivalents",
+    "total_assets":                            "TotalAssets",
+    "total_liabilities_net_minority_interest": "TotalLiabilities",
+}
+
+@CACHE.memoize(expire=86400)     # index membership changes rarely
 def get_sp500_tickers():
     """Scrape live S&P 500 tickers from Wikipedia."""
-    url = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
-    tables = pd.read_html(url)
-    df     = tables[0]
-    return df.Symbol.str.replace(".", "-", regex=False).tolist()
+    url  = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
+    resp = requests.get(url, headers={"User-Agent": "Mozilla/5.0"}, timeout=10)
+    resp.raise_for_status()
+    # parse just the first column of the constituents table via XPath
+    doc  = lxml.html.fromstring(resp.content)
+    syms = doc.xpath('//table[@id="constituents"]//tr/td[1]/a/text()')
+    return [s.replace(".", "-") for s in syms]
+
+def _yahoo_session() -> tuple[requests.Session, str]:
+    """
+    A Session primed with the cookie + crumb that Yahoo's quote API
+    insists on. Raises if the crumb request itself is refused.
+    """
+    sess = requests.Session()
+    sess.headers["User-Agent"] = "Mozilla/5.0"
+    sess.get("https://fc.yahoo.com", timeout=10)  # only sets the cookie, a 404 is normal
+    resp = sess.get("https://query2.finance.yahoo.com/v1/test/getcrumb", timeout=10)
+    resp.raise_for_status()  # a 429 body must never become the crumb
+    return sess, resp.text
+
+def _quote_chunk(sess: requests.Session, crumb: str, chunk: list[str]) -> dict[str, float] | None:
+    """One quote call for up to 20 symbols -> {symbol: marketCap}; None if the call failed."""
+    try:
+        resp = sess.get(QUOTE_URL, params={"symbols": ",".join(chunk), "crumb": crumb}, timeout=10)
+        resp.raise_for_status()
+        result = resp.json()["quoteResponse"]["result"]
+    except (requests.RequestException, KeyError, json.JSONDecodeError) as e:
+        warnings.warn(f"{','.join(chunk)}: {e}")
+        return None
+    return {q["symbol"]: q["marketCap"] for q in result if "marketCap" in q}
+
+def _fast_market_cap(ticker: str) -> float | None:
+    """
+    Single-symbol fallback via yfinance `fast_info` (one chart call);
+    the heavy `.info` payload only if fast_info lacks the field.
+    """
+    t = yf.Ticker(ticker)
+    try:
+        try:
+            return t.fast_info["market_cap"]
+        except (KeyError, ValueError):
+            return t.info.get("marketCap")
+    except Exception as e:  # yfinance raises a grab-bag of types for dead symbols
+        warnings.warn(f"{ticker}: {e}")
+        return None
+
+def get_market_caps(tickers: list[str]) -> dict[str, float]:
+    """
+    Fetch (approximate) current market caps for all `tickers`,
+    batching 20 symbols per quote request and running the chunks in parallel.
+    """
+    key = ("get_market_caps", tuple(tickers))
+    caps = CACHE.get(key)
+    if caps is not None:
+        return caps
 
-def get_market_cap(ticker, as_of_date):
-    """Fetch (approximate) current market cap via yfinance."""
-    info = yf.Ticker(ticker).info
-    return info.get("marketCap", 0)
+    chunks = [tickers[i:i + QUOTE_BATCH] for i in range(0, len(tickers), QUOTE_BATCH)]
+    caps = {}
+    complete = True  # every quote batch answered
+    try:
+        sess, crumb = _yahoo_session()
+    except requests.RequestException as e:
+        warnings.warn(f"Yahoo quote session unavailable, using fast_info only: {e}")
+        chunks, complete = [], False
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        # one primed Session shared by the workers: cookie + crumb fetched once per call
+        for part in ex.map(lambda chunk: _quote_chunk(sess, crumb, chunk), chunks):
+            if part is None:
+                complete = False
+            else:
+                caps.update(part)
+        # symbols the quote batch came back without: one light fast_info call each
+        missing = [t for t in tickers if t not in caps]
+        for t, cap in zip(missing, ex.map(_fast_market_cap, missing)):
+            if cap:
+                caps[t] = cap
+
+    if not caps:
+        raise RuntimeError(f"no market caps returned for any of {len(tickers)} tickers")
+    # memoise only a full answer, so a failed or partial fetch isn't replayed
+    if complete:
+        CACHE.set(key, caps, expire=900)  # prices move intraday
+    return caps
 
 def find_index_label(series: pd.Series, keywords: list[str]) -> str:
     """
     Find the first index in a Series whose lowercase name contains
     all keywords. E.g. ["total","liabil"] will match "TotalLiabilities".
     """
-    for label in series.index:
-        low = label.lower()
-        if all(k in low for k in keywords):
-            return label
+    low  = series.index.str.lower()
+    mask = low.str.contains(keywords[0], regex=False)
+    for k in keywords[1:]:
+        mask &= low.str.contains(k, regex=False)
+    if mask.any():
+        return series.index[mask.argmax()]
     # debug: print what you actually have
     print(f"[DEBUG] available fields for series '{series.name}':\n", series.index.tolist())
     raise KeyError(f"No field matching {keywords} in series '{series.name}'")
 
+def _write_statement(latest: pd.DataFrame, path: Path) -> None:
+    """Write via a temp file + os.replace, so a crash never leaves a half-written cache entry."""
+    tmp = None
+    try:
+        STATEMENT_DIR.mkdir(exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=STATEMENT_DIR, suffix=".tmp")
+        os.close(fd)
+        latest.to_parquet(tmp, engine="pyarrow", compression="zstd")
+        os.replace(tmp, path)
+    except (OSError, ValueError, TypeError, pa.ArrowException) as e:
+        # the fetched statement is still good; only the cache write is lost
+        warnings.warn(f"couldn't cache {path}: {e}")
+        if tmp and os.path.exists(tmp):
+            os.remove(tmp)
+
+def _latest_statement(ticker: str, stmt: str, period: str) -> pd.Series:
+    """
+    Latest row of one OpenBB statement as a Series. Only that row is
+    persisted (zstd Parquet); reruns within a week read it back instead
+    of re-fetching and re-parsing the full statement history.
+    """
+    path = STATEMENT_DIR / f"{ticker}_{stmt}_{period}.parquet"
+    if path.exists() and time.time() - path.stat().st_mtime < STATEMENT_TTL:
+        try:
+            return pq.read_table(path).to_pandas().squeeze()
+        except (OSError, pa.ArrowException) as e:  # unreadable file: treat as a miss
+            warnings.warn(f"{path}: {e}")
+    latest = getattr(obb.equity.fundamental, stmt)(ticker, period=period).to_df().tail(1)
+    _write_statement(latest, path)
+    return latest.squeeze()
+
 def load_financials(ticker: str):
     """
     Pull annual income, balance & cash-flow statements for `ticker`,
     convert to DataFrames, then take the latest row as a Series.
     """
-    inc_df = obb.equity.fundamental.income(ticker, period="annual").to_df()
-    bal_df = obb.equity.fundamental.balance(ticker, period="annual").to_df()
-    cfs_df = obb.equity.fundamental.cash(ticker, period="annual").to_df()
-
-    latest_inc = inc_df.tail(1).squeeze()
-    latest_bal = bal_df.tail(1).squeeze()
-    latest_cfs = cfs_df.tail(1).squeeze()
+    # the three statements are independent requests, so fetch them side by side
+    futures = [_STATEMENT_POOL.submit(_latest_statement, ticker, stmt, "annual")
+               for stmt in ("income", "balance", "cash")]
+    latest_inc, latest_bal, latest_cfs = (f.result() for f in futures)
 
     return latest_inc, latest_bal, latest_cfs
 
+@CACHE.memoize(name="mark_spitznagelf.load_universe_financials", expire=7 * 86400)
+def load_universe_financials(tickers: list[str]) -> dict:
+    """
+    Latest annual income & balance-sheet items the screen uses, for every
+    ticker, in one DuckDB query over the Parquet mirror (HTTP range reads,
+    cached locally by cache_httpfs). Returns {ticker: (inc, bal, cfs)}
+    Series triples, labelled per MIRROR_ITEMS; cfs is empty since the
+    screen never reads it. Tickers the mirror lacks are simply absent.
+    Raises duckdb.Error on failure, so a bad fetch is never memoised.
+    """
+    con = duckdb.connect()
+    con.execute("INSTALL httpfs; LOAD httpfs; INSTALL cache_httpfs FROM community; LOAD cache_httpfs;")
+    long_df = con.execute(f"""
+        SELECT symbol, finance_type, item_name, item_value
+        FROM read_parquet('{STATEMENTS_PARQUET}')
+        WHERE period_type = 'annual'
+          AND finance_type IN ('income_statement', 'balance_sheet')
+          AND item_name IN (SELECT unnest(?))
+          AND symbol IN (SELECT unnest(?))
+        QUALIFY report_date = max(report_date) OVER (PARTITION BY symbol, finance_type)
+        ORDER BY symbol, finance_type, item_name, item_value
+    """, [list(MIRROR_ITEMS), tickers]).df()
+    # the scan is parallel, so pin one row per item before building Series
+    long_df = long_df.drop_duplicates(["symbol", "finance_type", "item_name"])
+    long_df["item_name"] = long_df["item_name"].map(MIRROR_ITEMS)
+
+    stmts = {
+        key: grp.set_index("item_name")["item_value"].rename(key[0])
+        for key, grp in long_df.groupby(["symbol", "finance_type"])
+    }
+    return {
+        tkr: (stmts[(tkr, "income_statement")],
+              stmts[(tkr, "balance_sheet")],
+              pd.Series(dtype=float, name=tkr))
+        for tkr in tickers
+        if (tkr, "income_statement") in stmts and (tkr, "balance_sheet") in stmts
+    }
+
 def compute_roic(inc: pd.Series, bal: pd.Series, tax_rate: float = 0.21) -> float:
     """
     NOPAT / Invested Capital
@@ -71,27 +251,43 @@ def compute_faustmann(mkt_cap: float, bal: pd.Series) -> float:
 
 def screen_universe(as_of_date: datetime.date) -> pd.DataFrame:
     universe = get_sp500_tickers()
-    picks    = []
+    caps     = get_market_caps(universe)
+    rows     = []
+    try:
+        bulk = load_universe_financials(universe)
+    except duckdb.Error as e:
+        print(f"[WARN] bulk fundamentals unavailable, falling back to OpenBB: {e}")
+        bulk = {}
 
     for tkr in universe:
+        # no cap means no FR: skip before paying for any statement fetch
+        if tkr not in caps:
+            print(f"[WARN] skipping {tkr} — no market cap")
+            continue
+
         try:
-            inc, bal, cfs = load_financials(tkr)
+            # one bulk read covers most of the index; OpenBB only for the gaps
+            inc, bal, cfs = bulk[tkr] if tkr in bulk else load_financials(tkr)
         except Exception as e:
             print(f"[WARN] couldn’t load fundamentals for {tkr}: {e}")
             continue
 
         try:
             roic = compute_roic(inc, bal)
-            fr   = compute_faustmann(get_market_cap(tkr, as_of_date), bal)
+            fr   = compute_faustmann(caps[tkr], bal)
         except KeyError as ke:
             print(f"[WARN] skipping {tkr} — missing field: {ke}")
             continue
 
-        if roic > 1.0 and fr < 0.7:
-            picks.append({"ticker": tkr, "roic": roic, "fr": fr})
+        rows.append((tkr, roic, fr))
 
-    df = pd.DataFrame(picks, columns=["ticker", "roic", "fr"])
-    return df.sort_values("fr", ignore_index=True)
+    # screen the whole universe in one vectorised pass rather than per ticker;
+    # pandas runs it through numexpr when that is installed
+    df = pd.DataFrame(rows, columns=["ticker", "roic", "fr"])
+    picks = df.query("roic > 1.0 and fr < 0.7")
+    # the thresholds are applied at full precision; only the result is narrowed
+    picks = picks.astype({"ticker": "category", "roic": "float32", "fr": "float32"})
+    return picks.sort_values("fr", ignore_index=True)
 
 if __name__ == "__main__":
     today = datetime.date.today()